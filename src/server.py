@@ -7,28 +7,195 @@ FastMCP server exposed over HTTP (/mcp) that forwards
 
 from __future__ import annotations
 
+import asyncio
 import os
-from typing import Any, Dict
-
-import httpx
-from dotenv import load_dotenv
+import random
+import re
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Any, Dict
+
+import orjson
+from cachetools import LRUCache, TTLCache
 from fastmcp import FastMCP
 
+if TYPE_CHECKING:
+    import httpx
+
+
+# Load local .env for development only; on Render (ENV=production, see
+# render.yaml) env vars are injected directly, so skip the filesystem search.
+if os.getenv("ENV", "dev") == "dev":
+    from dotenv import load_dotenv
 
-# Load local .env for development; on Render, env vars are injected directly.
-load_dotenv()
+    load_dotenv()
 
 mcp = FastMCP("Tembo Task Manager")
 
-TEMBO_BASE_URL = os.getenv("TEMBO_API_BASE_URL", "https://api.tembo.io")
+
+@dataclass(frozen=True, slots=True)
+class Config:
+    """Server settings, read from the environment once at import."""
+
+    tembo_key: str
+    github_token: str
+    tembo_base: str
+
+    @classmethod
+    def from_env(cls) -> Config:
+        # An empty value (e.g. left blank in the Render dashboard) means "default".
+        tembo_base = (os.getenv("TEMBO_API_BASE_URL") or "https://api.tembo.io").rstrip("/")
+        if not tembo_base.startswith(("https://", "http://")):
+            raise RuntimeError(
+                f"TEMBO_API_BASE_URL must be an http(s) URL, got {tembo_base!r}."
+            )
+
+        # Credentials stay optional here: each tool reports its own missing key
+        # so e.g. check_pr_mergeable still works on a GitHub-only deployment.
+        return cls(
+            tembo_key=os.getenv("TEMBO_API_KEY", ""),
+            github_token=os.getenv("GITHUB_TOKEN", ""),
+            tembo_base=tembo_base,
+        )
+
+
+CFG = Config.from_env()
+
+# Shared async client so calls to api.tembo.io / api.github.com reuse pooled
+# keep-alive connections instead of paying a TCP+TLS handshake per tool call,
+# and concurrent tool invocations don't each block a worker thread.
+# aiohttp was considered for tail latency under bursty load (encode/httpx#3215),
+# but traffic here is a handful of calls per chat turn and httpx keeps HTTP/2
+# support and a single client library; revisit if concurrency grows.
+# httpx (+ h2) is imported and the client built on first use, keeping them off
+# the import path when this module is loaded as a library.
+_ACLIENT: httpx.AsyncClient | None = None
+
+
+def _get_http() -> httpx.AsyncClient:
+    global _ACLIENT
+    if _ACLIENT is None:
+        import httpx
+
+        _ACLIENT = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=100,
+                max_keepalive_connections=20,
+                keepalive_expiry=30.0,
+            ),
+            timeout=httpx.Timeout(30.0, connect=5.0),
+            # Both upstreams speak h2, letting concurrent calls multiplex on one socket.
+            http2=True,
+        )
+    return _ACLIENT
+
+
+# Tembo POSTs create tasks/automations, so only retry when the request provably
+# wasn't processed: rate limited / unavailable responses, or no connection made.
+_TEMBO_RETRY_STATUSES = frozenset({429, 503})
+_TEMBO_MAX_RETRIES = 3
+_TEMBO_RETRY_BASE = 0.5
+_TEMBO_RETRY_AFTER_CAP = 10.0
+
+
+async def _post_tembo(url: str, content: bytes) -> httpx.Response:
+    import httpx
+
+    client = _get_http()
+    attempt = 0
+    while True:
+        delay = _TEMBO_RETRY_BASE * 2**attempt + random.uniform(0, 0.1)
+        try:
+            response = await client.post(url, content=content, headers=_TEMBO_HEADERS)
+        except (httpx.ConnectError, httpx.ConnectTimeout):
+            if attempt >= _TEMBO_MAX_RETRIES:
+                raise
+        else:
+            if response.status_code not in _TEMBO_RETRY_STATUSES or attempt >= _TEMBO_MAX_RETRIES:
+                return response
+            retry_after = response.headers.get("Retry-After", "")
+            if retry_after.isdigit():
+                delay = min(float(retry_after), _TEMBO_RETRY_AFTER_CAP)
+
+        attempt += 1
+        await asyncio.sleep(delay)
+
+
+# Input checks compiled once at import rather than on each tool call.
+_REPO_RE = re.compile(r"https?://[^\s]+")
+_CRON_RE = re.compile(r"(\S+\s+){4}\S+")
+
+_GITHUB_GRAPHQL_URL = "https://api.github.com/graphql"
+
+_MISSING_GITHUB_TOKEN_ERROR = (
+    "GITHUB_TOKEN environment variable not set. "
+    "Create a fine-grained PAT with at least 'Pull requests: read' "
+    "access for the relevant repositories."
+)
+
+# Ask GraphQL for just the fields we read instead of the full REST PR payload.
+_PR_MERGEABLE_QUERY = """
+query($owner: String!, $name: String!, $number: Int!) {
+  repository(owner: $owner, name: $name) {
+    pullRequest(number: $number) {
+      mergeable
+      mergeStateStatus
+      url
+      headRefName
+      baseRefName
+    }
+  }
+}
+"""
+
+_GRAPHQL_MERGEABLE: Dict[str | None, bool | None] = {
+    "MERGEABLE": True,
+    "CONFLICTING": False,
+    "UNKNOWN": None,
+}
+
+# Short-lived check_pr_mergeable results so tight polling loops on the same PR
+# collapse into one upstream call. All access happens on the event loop with no
+# await between lookup and store, so no lock is needed.
+_PR_RESULT_CACHE: TTLCache[tuple[str, str, int], Dict[str, Any]] = TTLCache(
+    maxsize=4096, ttl=3
+)
+_PR_PENDING_CACHE: TTLCache[tuple[str, str, int], Dict[str, Any]] = TTLCache(
+    maxsize=4096, ttl=1
+)
+
+# Last successful result per PR with its time.monotonic() timestamp, served
+# (flagged stale) when GitHub is unreachable or returning 5xx.
+_PR_LAST_GOOD: LRUCache[tuple[str, str, int], tuple[float, Dict[str, Any]]] = LRUCache(
+    maxsize=4096
+)
+_PR_STALE_MAX_AGE = 300.0
+
+# Backoff (seconds) between re-polls while GitHub reports mergeable as unknown.
+_MERGEABLE_RETRY_DELAYS = (0.5, 1.0, 2.0)
 
 
 def _build_tembo_url(path: str) -> str:
-    return TEMBO_BASE_URL.rstrip("/") + path
+    return CFG.tembo_base + path
+
+
+# URLs and auth headers are fixed for the life of the process, so build them
+# once at import instead of on every tool call.
+_TASK_CREATE_URL = _build_tembo_url("/task/create")
+_AUTOMATION_URL = _build_tembo_url("/automation")
+_TEMBO_HEADERS = {
+    "Authorization": f"Bearer {CFG.tembo_key}",
+    "Content-Type": "application/json",
+}
+
+_GITHUB_HEADERS = {
+    "Authorization": f"Bearer {CFG.github_token}",
+    "Content-Type": "application/json",
+}
 
 
 @mcp.tool
-def create_tembo_task(
+async def create_tembo_task(
     prompt: str,
     repositories: list[str] | None = None,
     agent: str | None = None,
@@ -97,8 +264,7 @@ def create_tembo_task(
     ### API Reference
     # https://docs.tembo.io/api-reference/public-api/create-task
 
-    api_key = os.getenv("TEMBO_API_KEY")
-    if not api_key:
+    if not CFG.tembo_key:
         return {
             "ok": False,
             "error": "Missing TEMBO_API_KEY env",
@@ -110,9 +276,9 @@ def create_tembo_task(
             "error": "prompt is required and must be non-empty.",
         }
 
-    payload: Dict[str, Any] = {
-        "prompt": prompt,
-    }
+    # Assemble the JSON body from constant key fragments and orjson-encoded
+    # values rather than building a dict for orjson to walk on every call.
+    body = [b'{"prompt":', orjson.dumps(prompt)]
 
     # Only send repositories when explicitly provided and non-empty.
     if repositories is not None:
@@ -121,24 +287,26 @@ def create_tembo_task(
                 "ok": False,
                 "error": "repositories must be a non-empty list of repository URLs when provided.",
             }
-        payload["repositories"] = repositories
+        invalid = [repo for repo in repositories if not _REPO_RE.fullmatch(repo)]
+        if invalid:
+            return {
+                "ok": False,
+                "error": f"repositories must be http(s) URLs; got {invalid!r}.",
+            }
+        body += (b',"repositories":', orjson.dumps(repositories))
 
     if agent is not None:
-        payload["agent"] = agent
+        body += (b',"agent":', orjson.dumps(agent))
     if branch is not None:
-        payload["branch"] = branch
+        body += (b',"branch":', orjson.dumps(branch))
     if queue_right_away is not None:
-        payload["queueRightAway"] = queue_right_away
+        body.append(b',"queueRightAway":true' if queue_right_away else b',"queueRightAway":false')
+    body.append(b"}")
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-
-    url = _build_tembo_url("/task/create")
+    import httpx
 
     try:
-        response = httpx.post(url, json=payload, headers=headers, timeout=30.0)
+        response = await _post_tembo(_TASK_CREATE_URL, b"".join(body))
     except httpx.RequestError as exc:
         return {
             "ok": False,
@@ -148,7 +316,7 @@ def create_tembo_task(
     # Tembo's Create Task docs specify 200 on success.
     if response.status_code != 200:
         try:
-            data = response.json()
+            data = orjson.loads(response.content)
         except Exception:
             data = None
 
@@ -175,7 +343,7 @@ def create_tembo_task(
         return result
 
     try:
-        data = response.json()
+        data = orjson.loads(response.content)
     except Exception as exc:
         return {
             "ok": False,
@@ -206,7 +374,7 @@ def create_tembo_task(
 
 
 @mcp.tool
-def create_tembo_automation(
+async def create_tembo_automation(
     name: str,
     aim: str,
     cron: str,
@@ -272,8 +440,7 @@ def create_tembo_automation(
         https://api.tembo.io/#tag/public-api/post/automation
     """
     
-    api_key = os.getenv("TEMBO_API_KEY")
-    if not api_key:
+    if not CFG.tembo_key:
         return {
             "ok": False,
             "error": "Missing TEMBO_API_KEY env",
@@ -297,6 +464,13 @@ def create_tembo_automation(
             "error": "cron is required and must be a non-empty cron expression string.",
         }
 
+    cron = cron.strip()
+    if not _CRON_RE.fullmatch(cron):
+        return {
+            "ok": False,
+            "error": f"cron must be a 5-field cron expression (e.g. \"0 * * * *\"); got {cron!r}.",
+        }
+
     json_content: Dict[str, Any] = {"aim": aim}
 
     if extra_json_content is not None:
@@ -326,15 +500,10 @@ def create_tembo_automation(
     if triggers is not None:
         payload["triggers"] = triggers
 
-    headers = {
-        "Authorization": f"Bearer {api_key}",
-        "Content-Type": "application/json",
-    }
-
-    url = _build_tembo_url("/automation")
+    import httpx
 
     try:
-        response = httpx.post(url, json=payload, headers=headers, timeout=30.0)
+        response = await _post_tembo(_AUTOMATION_URL, orjson.dumps(payload))
     except httpx.RequestError as exc:
         return {
             "ok": False,
@@ -343,7 +512,7 @@ def create_tembo_automation(
 
     if response.status_code != 200:
         try:
-            data = response.json()
+            data = orjson.loads(response.content)
         except Exception:
             data = None
 
@@ -358,7 +527,7 @@ def create_tembo_automation(
         }
 
     try:
-        data = response.json()
+        data = orjson.loads(response.content)
     except Exception as exc:
         return {
             "ok": False,
@@ -391,7 +560,7 @@ def create_tembo_automation(
 
 
 @mcp.tool
-def check_pr_mergeable(
+async def check_pr_mergeable(
     repo_owner: str,
     repo_name: str,
     pr_number: int,
@@ -399,10 +568,10 @@ def check_pr_mergeable(
     """
     Check whether a GitHub pull request is cleanly mergeable or has merge conflicts.
 
-    This tool calls GitHub's Pulls API (`GET /repos/{owner}/{repo}/pulls/{pull_number}`)
-    and inspects the `mergeable` and `mergeable_state` fields to determine if the PR is
-    cleanly mergeable, still being computed, or blocked by conflicts between the head
-    and base branches.
+    This tool queries GitHub's GraphQL API (`repository.pullRequest`) for the PR's
+    `mergeable` and `mergeStateStatus` fields to determine if the PR is cleanly
+    mergeable, still being computed, or blocked by conflicts between the head and
+    base branches.
 
     When to use:
       - Before triggering an automated change (e.g., a Tembo task) that targets the PR's base branch.
@@ -431,6 +600,7 @@ def check_pr_mergeable(
               "message": <human-readable summary>,
               "head_ref": <str | None>,
               "base_ref": <str | None>,
+              "stale": True,  # only present when served from cache during a GitHub outage
             }
         on error:
             {
@@ -444,17 +614,12 @@ def check_pr_mergeable(
         "Pull requests: read" access for the relevant repository.
     """
     ### API Reference docs:
-    # https://docs.github.com/en/rest/pulls/pulls#get-a-pull-request
+    # https://docs.github.com/en/graphql/reference/objects#pullrequest
 
-    token = os.getenv("GITHUB_TOKEN")
-    if not token:
+    if not CFG.github_token:
         return {
             "ok": False,
-            "error": (
-                "GITHUB_TOKEN environment variable not set. "
-                "Create a fine-grained PAT with at least 'Pull requests: read' "
-                "access for the relevant repositories."
-            ),
+            "error": _MISSING_GITHUB_TOKEN_ERROR,
         }
 
     if pr_number <= 0:
@@ -463,32 +628,176 @@ def check_pr_mergeable(
             "error": "pr_number must be a positive integer.",
         }
 
-    headers = {
-        "Accept": "application/vnd.github+json",
-        "Authorization": f"Bearer {token}",
-        "X-GitHub-Api-Version": "2022-11-28",
-    }
+    return await _check_pr_mergeable(repo_owner, repo_name, pr_number)
 
-    url = f"https://api.github.com/repos/{repo_owner}/{repo_name}/pulls/{pr_number}"
 
-    try:
-        response = httpx.get(url, headers=headers, timeout=15.0)
-    except httpx.RequestError as exc:
+@mcp.tool
+async def check_prs_mergeable(prs: list[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Check several GitHub pull requests for merge conflicts in one call.
+
+    Same check as `check_pr_mergeable`, but the lookups run concurrently over a
+    single shared connection to GitHub instead of one tool call per PR.
+
+    When to use:
+      - When triaging a batch of PRs (possibly across repositories) to see which
+        are clean vs. blocked by conflicts.
+
+    Arguments:
+        prs (list[dict]):
+            Pull requests to inspect. Each item must contain:
+              - "repo_owner" (str): GitHub organization or user, e.g. "tembo-io".
+              - "repo_name" (str): Repository name, e.g. "temboXpoke".
+              - "pr_number" (int): Positive pull request number.
+
+    Returns:
+        On success:
+            {
+              "ok": True,
+              "results": [
+                {
+                  "repo_owner": <str>,
+                  "repo_name": <str>,
+                  "pr_number": <int>,
+                  ...  # same fields as check_pr_mergeable, including "ok"
+                },
+                ...
+              ],  # same order as `prs`
+            }
+
+        On error:
+            {
+              "ok": False,
+              "error": <explanation>,
+            }
+
+    Notes:
+        Requires the `GITHUB_TOKEN` environment variable to be set with at least
+        "Pull requests: read" access for the relevant repositories. A failure for
+        one PR is reported in its own result and does not fail the whole batch.
+    """
+    if not CFG.github_token:
         return {
             "ok": False,
-            "error": f"Network error calling GitHub: {exc}",
+            "error": _MISSING_GITHUB_TOKEN_ERROR,
         }
 
-    if response.status_code == 404:
+    if not prs:
         return {
             "ok": False,
-            "error": f"PR #{pr_number} not found in {repo_owner}/{repo_name}.",
+            "error": "prs must be a non-empty list of pull requests.",
+        }
+
+    refs: list[tuple[str, str, int]] = []
+    for index, pr in enumerate(prs):
+        repo_owner = pr.get("repo_owner")
+        repo_name = pr.get("repo_name")
+        pr_number = pr.get("pr_number")
+        if (
+            not isinstance(repo_owner, str)
+            or not isinstance(repo_name, str)
+            or not isinstance(pr_number, int)
+            or isinstance(pr_number, bool)
+            or pr_number <= 0
+        ):
+            return {
+                "ok": False,
+                "error": (
+                    f"prs[{index}] must be an object with string repo_owner, "
+                    "string repo_name and positive integer pr_number."
+                ),
+            }
+        refs.append((repo_owner, repo_name, pr_number))
+
+    outcomes = await asyncio.gather(
+        *(_check_pr_mergeable(*ref) for ref in refs),
+        return_exceptions=True,
+    )
+
+    results: list[Dict[str, Any]] = []
+    for (repo_owner, repo_name, pr_number), outcome in zip(refs, outcomes):
+        if isinstance(outcome, BaseException):
+            outcome = {
+                "ok": False,
+                "error": f"Unexpected error checking PR #{pr_number}: {outcome}",
+            }
+        results.append(
+            {"repo_owner": repo_owner, "repo_name": repo_name, "pr_number": pr_number, **outcome}
+        )
+
+    return {
+        "ok": True,
+        "results": results,
+    }
+
+
+async def _check_pr_mergeable(
+    repo_owner: str,
+    repo_name: str,
+    pr_number: int,
+) -> Dict[str, Any]:
+    cache_key = (repo_owner, repo_name, pr_number)
+    cached = _PR_RESULT_CACHE.get(cache_key) or _PR_PENDING_CACHE.get(cache_key)
+    if cached is not None:
+        return cached
+
+    result = await _fetch_pr_mergeable(repo_owner, repo_name, pr_number)
+
+    # GitHub computes mergeability lazily and answers None until it's done;
+    # re-poll a few times over the kept-alive connection before handing back.
+    for delay in _MERGEABLE_RETRY_DELAYS:
+        if not result["ok"] or result.get("stale") or result["mergeable"] is not None:
+            break
+        await asyncio.sleep(delay)
+        result = await _fetch_pr_mergeable(repo_owner, repo_name, pr_number)
+
+    if result["ok"] and not result.get("stale"):
+        # Keep "still computing" answers only briefly so a caller's retry soon
+        # reaches GitHub again instead of replaying the stale None, and never
+        # let one replace a definite answer in the outage fallback.
+        if result["mergeable"] is None:
+            _PR_PENDING_CACHE[cache_key] = result
+        else:
+            _PR_RESULT_CACHE[cache_key] = result
+            _PR_LAST_GOOD[cache_key] = (time.monotonic(), result)
+
+    return result
+
+
+async def _fetch_pr_mergeable(
+    repo_owner: str,
+    repo_name: str,
+    pr_number: int,
+) -> Dict[str, Any]:
+    payload = {
+        "query": _PR_MERGEABLE_QUERY,
+        "variables": {"owner": repo_owner, "name": repo_name, "number": pr_number},
+    }
+
+    cache_key = (repo_owner, repo_name, pr_number)
+
+    import httpx
+
+    try:
+        response = await _get_http().post(
+            _GITHUB_GRAPHQL_URL,
+            content=orjson.dumps(payload),
+            headers=_GITHUB_HEADERS,
+            timeout=15.0,
+        )
+    except httpx.RequestError as exc:
+        stale = _stale_pr_result(cache_key)
+        if stale is not None:
+            return stale
+        return {
+            "ok": False,
+            "error": f"Network error calling GitHub: {exc}",
         }
 
     if response.status_code in (401, 403):
         # Authentication / authorization issue – surface a clear hint about token scopes.
         try:
-            data = response.json()
+            data = orjson.loads(response.content)
         except Exception:
             data = None
 
@@ -507,6 +816,10 @@ def check_pr_mergeable(
         }
 
     if response.status_code != 200:
+        if response.status_code >= 500:
+            stale = _stale_pr_result(cache_key)
+            if stale is not None:
+                return stale
         return {
             "ok": False,
             "status": response.status_code,
@@ -514,7 +827,7 @@ def check_pr_mergeable(
         }
 
     try:
-        pr_data = response.json()
+        data = orjson.loads(response.content)
     except Exception as exc:
         return {
             "ok": False,
@@ -522,14 +835,31 @@ def check_pr_mergeable(
             "error": f"Failed to parse GitHub PR JSON: {exc}",
         }
 
-    mergeable = pr_data.get("mergeable")  # true, false, or null (while computing)
-    mergeable_state = pr_data.get("mergeable_state")
-    pr_url = pr_data.get("html_url")
+    # GraphQL reports a missing repo/PR as a 200 with a NOT_FOUND error entry.
+    repository = (data.get("data") or {}).get("repository") or {}
+    pr_data = repository.get("pullRequest")
+    if pr_data is None:
+        errors = data.get("errors") or []
+        if not errors or any(err.get("type") == "NOT_FOUND" for err in errors):
+            return {
+                "ok": False,
+                "error": f"PR #{pr_number} not found in {repo_owner}/{repo_name}.",
+            }
+        return {
+            "ok": False,
+            "status": response.status_code,
+            "error": f"GitHub API error: {errors[0].get('message')}",
+        }
+
+    # Map GraphQL enums onto the REST semantics callers already rely on:
+    # MERGEABLE/CONFLICTING/UNKNOWN -> True/False/None, CLEAN/DIRTY/... -> "clean"/"dirty"/...
+    mergeable = _GRAPHQL_MERGEABLE.get(pr_data.get("mergeable"))
+    merge_state = pr_data.get("mergeStateStatus")
+    mergeable_state = merge_state.lower() if merge_state else None
+    pr_url = pr_data.get("url")
 
-    base = pr_data.get("base") or {}
-    head = pr_data.get("head") or {}
-    base_ref = base.get("ref")
-    head_ref = head.get("ref")
+    base_ref = pr_data.get("baseRefName")
+    head_ref = pr_data.get("headRefName")
 
     has_conflict: bool | None
     status_msg: str
@@ -567,8 +897,41 @@ def check_pr_mergeable(
     }
 
 
+def _stale_pr_result(cache_key: tuple[str, str, int]) -> Dict[str, Any] | None:
+    entry = _PR_LAST_GOOD.get(cache_key)
+    if entry is None:
+        return None
+
+    stored_at, result = entry
+    if time.monotonic() - stored_at > _PR_STALE_MAX_AGE:
+        return None
+
+    return {
+        **result,
+        "stale": True,
+        "message": f"{result['message']} (Serving stale cache: GitHub unreachable.)",
+    }
+
+
+async def _serve(port: int) -> None:
+    try:
+        await mcp.run_async(transport="http", host="0.0.0.0", port=port)
+    finally:
+        # Close pooled connections on the same event loop that opened them.
+        if _ACLIENT is not None:
+            await _ACLIENT.aclose()
+
+
 if __name__ == "__main__":
     # Render provides PORT; default to 8000 for local dev
     port = int(os.getenv("PORT", "8000"))
-    mcp.run(transport="http", host="0.0.0.0", port=port)
+
+    # uvloop's libuv-based loop speeds up socket I/O for the HTTP transport and
+    # outbound calls; it isn't available on Windows, so fall back to asyncio.
+    try:
+        import uvloop
+    except ImportError:
+        asyncio.run(_serve(port))
+    else:
+        uvloop.run(_serve(port))
 